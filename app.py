@@ -1,55 +1,148 @@
 import io
+from collections import namedtuple
 import streamlit as st
-import pandas as pd
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-from matplotlib.patches import Arc, Circle, Rectangle
+import pyarrow.parquet as pq
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.patches import Arc, Rectangle
 from matplotlib.lines import Line2D
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.transforms import AffineDeltaTransform
+from numba import njit
 
 # ── PART 1: GEOMETRY ENGINE ───────────────────────────────────────────────────
-def simulate_new_zones(row, new_arc_dist):
-    dist = row['SHOT_DISTANCE'] / 10 if row['SHOT_DISTANCE'] > 100 else row['SHOT_DISTANCE']
-    x, y = row['LOC_X'], row['LOC_Y']
+# Zone codes index into this list; every code >= 3 is a three-pointer.
+ZONE_ORDER = [
+    'Paint',
+    'Short Mid-Range',
+    'Long Mid-Range (Sim)',
+    'Wing 3 (Sim)',
+    'Corner 3 (Sim)',
+    'Top of Key 3 (Sim)',
+]
+ZONE_POINTS = np.array([2, 2, 2, 3, 3, 3], dtype=np.float32)
+
+# 3-point line distances the sidebar slider can produce (ft).
+ARC_MIN, ARC_MAX, ARC_STEP = 22.0, 32.0, 0.25
+ARC_DISTS = np.arange(ARC_MIN, ARC_MAX + ARC_STEP / 2, ARC_STEP)
+
+# Three-point zone code for each angle bucket: corner side, wing, top of key.
+THREE_ZONE_BY_BUCKET = np.array([4, 3, 5], dtype=np.int8)
+
+ShotGeometry = namedtuple('ShotGeometry',
+                          ['dist_ft', 'is_corner', 'angle_bucket', 'made', 'locx', 'locy'])
+
+
+def preprocess(shots):
+    """Per-shot invariants that do not depend on the arc distance."""
+    shot_dist = shots['SHOT_DISTANCE']
+    dist_ft = np.where(shot_dist > 100, shot_dist / 10, shot_dist).astype(np.float32)
+    x, y = shots['LOC_X'], shots['LOC_Y']
+
+    is_corner = y < 92.5
+
+    # The angle only matters for above-the-break shots past the short mid-range,
+    # so arctan2 runs on that subset; every other shot keeps bucket 0.
+    needs_angle = ~is_corner & (dist_ft >= 16)
+    angle   = np.arctan2(y[needs_angle], x[needs_angle]) * 180 / np.pi
+    is_wing = ((22 < angle) & (angle < 70)) | ((110 < angle) & (angle < 158))
+    angle_bucket = np.zeros(len(dist_ft), dtype=np.int8)
+    angle_bucket[needs_angle] = np.where(is_wing, 1, 2)
+
+    return ShotGeometry(dist_ft, is_corner, angle_bucket, shots['SHOT_MADE_FLAG'], x, y)
+
 
-    if dist < 8:  return 'Paint'
-    if dist < 16: return 'Short Mid-Range'
+@njit(fastmath=True, cache=True)
+def _zones(dist_ft, is_corner, angle_bucket, made, line_dist, codes_out, pts_out):
+    corner_dist = line_dist - 1.75
+    for i in range(dist_ft.shape[0]):
+        d = dist_ft[i]
+        if d < 8:
+            k = 0
+        elif d < 16:
+            k = 1
+        elif d >= (corner_dist if is_corner[i] else line_dist):
+            k = THREE_ZONE_BY_BUCKET[angle_bucket[i]]
+        else:
+            k = 2
+        codes_out[i] = k
+        pts_out[i] = (3 if k >= 3 else 2) * made[i]
 
-    new_corner_dist = new_arc_dist - 1.75
-    is_corner_area  = y < 92.5
 
-    is_three = (is_corner_area and dist >= new_corner_dist) or \
-               (not is_corner_area and dist >= new_arc_dist)
+def simulate_new_zones(geo, new_arc_dist):
+    """Fused zone assignment — returns (ZONE_ORDER index, simulated points) per shot."""
+    codes = np.empty(len(geo.dist_ft), dtype=np.int8)
+    pts   = np.empty(len(geo.dist_ft), dtype=np.float32)
+    _zones(geo.dist_ft, geo.is_corner, geo.angle_bucket, geo.made, new_arc_dist, codes, pts)
+    return codes, pts
 
-    if is_three:
-        if is_corner_area:
-            return 'Corner 3 (Sim)'
-        angle = np.arctan2(y, x) * 180 / np.pi
-        if (22 < angle < 70) or (110 < angle < 158):
-            return 'Wing 3 (Sim)'
-        return 'Top of Key 3 (Sim)'
 
-    return 'Long Mid-Range (Sim)'
+def zone_pps(codes, pts):
+    """Mean points per shot for every zone that has shots, keyed by zone name."""
+    sums   = np.bincount(codes, weights=pts, minlength=len(ZONE_ORDER))
+    counts = np.bincount(codes, minlength=len(ZONE_ORDER))
+    return {z: sums[i] / counts[i] for i, z in enumerate(ZONE_ORDER) if counts[i] > 0}
 
 
 # ── PART 2: HELPER FUNCTIONS ──────────────────────────────────────────────────
-def pps_to_hsl(pps, vmin=0.6, vmax=1.2):
-    clamped = max(0.0, min(1.0, (pps - vmin) / (vmax - vmin)))
-    hue = int(clamped * 120)
-    return f"hsl({hue}, 75%, 42%)"
+def pps_to_hsl(pps_values, vmin=0.6, vmax=1.2):
+    """Card colours for a sequence of PPS values — all hues in one NumPy pass."""
+    clamped = np.clip((np.asarray(pps_values) - vmin) / (vmax - vmin), 0.0, 1.0)
+    hues = (clamped * 120).astype(int)
+    return tuple(f"hsl({hue}, 75%, 42%)" for hue in hues)
+
+
+HexGrid = namedtuple('HexGrid', ['hexagon', 'centres', 'hex_id', 'counts'])
+
+
+def hex_grid(x, y, gridsize=25, extent=(-250, 250, -47.5, 422.5)):
+    """Assigns every shot to a hexagon on the same lattice ax.hexbin uses.
+
+    Shot positions never change with the arc, so this runs once per dataset.
+    """
+    nx, ny = gridsize, int(gridsize / np.sqrt(3))
+    xmin, xmax, ymin, ymax = extent
+    pad = 1e-9 * (xmax - xmin)
+    xmin, xmax = xmin - pad, xmax + pad
+    sx, sy = (xmax - xmin) / nx, (ymax - ymin) / ny
+
+    # Each shot is nearest to a centre on either the (nx+1, ny+1) lattice or the
+    # half-offset (nx, ny) lattice; pick the closer one in hex-index space.
+    ix, iy = (x - xmin) / sx, (y - ymin) / sy
+    ix1, iy1 = np.round(ix), np.round(iy)
+    ix2, iy2 = np.floor(ix), np.floor(iy)
+    on_1 = (ix - ix1) ** 2 + 3.0 * (iy - iy1) ** 2 < (ix - ix2 - 0.5) ** 2 + 3.0 * (iy - iy2 - 0.5) ** 2
+
+    n1 = (nx + 1) * (ny + 1)
+    n  = n1 + nx * ny
+    in_range = np.where(on_1,
+                        (0 <= ix1) & (ix1 <= nx) & (0 <= iy1) & (iy1 <= ny),
+                        (0 <= ix2) & (ix2 < nx) & (0 <= iy2) & (iy2 < ny))
+    hex_id = np.where(on_1, ix1 * (ny + 1) + iy1, n1 + ix2 * ny + iy2)
+    hex_id = np.where(in_range, hex_id, n).astype(np.intp)   # id n collects out-of-range shots
+
+    centres = np.concatenate([
+        np.column_stack([np.repeat(np.arange(nx + 1), ny + 1), np.tile(np.arange(ny + 1), nx + 1)]),
+        np.column_stack([np.repeat(np.arange(nx), ny) + 0.5, np.tile(np.arange(ny), nx) + 0.5]),
+    ]) * [sx, sy] + [xmin, ymin]
+    hexagon = [sx, sy / 3] * np.array([[.5, -.5], [.5, .5], [0., 1.], [-.5, .5], [-.5, -.5], [0., -1.]])
+    counts  = np.bincount(hex_id, minlength=n + 1)[:n]
+    return HexGrid(hexagon, centres, hex_id, counts)
+
+
+def hex_mean(grid, c, mincnt=5):
+    """Mean of c per hexagon — one weighted bincount over the precomputed hex ids.
+
+    Returns (hexagon vertices, centres, means) for hexagons holding >= mincnt shots.
+    """
+    n    = len(grid.centres)
+    sums = np.bincount(grid.hex_id, weights=c, minlength=n + 1)[:n]
+    keep = grid.counts >= mincnt
+    return grid.hexagon, grid.centres[keep], sums[keep] / grid.counts[keep]
 
 
 # ── PART 3: COURT ─────────────────────────────────────────────────────────────
-ZONE_ORDER = [
-    'Paint',
-    'Short Mid-Range',
-    'Long Mid-Range (Sim)',
-    'Wing 3 (Sim)',
-    'Corner 3 (Sim)',
-    'Top of Key 3 (Sim)',
-]
-
 ZONE_DISPLAY = {
     'Paint':               'Paint',
     'Short Mid-Range':     'Short Mid-Range',
@@ -60,26 +153,48 @@ ZONE_DISPLAY = {
 }
 
 
-def draw_hexbin_chart(line_dist, df):
-    fig, ax = plt.subplots(figsize=(8.5, 7.5), facecolor='#f5e6c8')
+def _arc(cx, cy, r, theta1=0, theta2=180, n=64):
+    t = np.radians(np.linspace(theta1, theta2, n))
+    return np.column_stack([cx + r * np.cos(t), cy + r * np.sin(t)])
+
+
+@st.cache_resource
+def court_segments():
+    """Static court markings as polylines — tessellated once, shared by every render."""
+    return [
+        np.array([[-250, -47.5], [250, -47.5], [250, 422.5], [-250, 422.5], [-250, -47.5]]),  # boundary
+        np.array([[-80, -47.5], [-80, 142.5], [80, 142.5], [80, -47.5]]),                    # lane + FT line
+        _arc(0, 142.5, 60),                                                                   # FT circle
+        _arc(0, 0, 40),                                                                       # restricted area
+        _arc(0, 0, 7.5, 0, 360),                                                              # rim
+        np.array([[-30, -7.5], [30, -7.5]]),                                                  # backboard
+    ]
+
+
+def draw_hexbin_chart(line_dist, hexes):
+    # Plain Figure + Agg canvas: no pyplot registry to touch from Streamlit threads
+    fig = Figure(figsize=(8.5, 7.5), dpi=100, facecolor='#f5e6c8')
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
     ax.set_facecolor('#f5e6c8')
 
     # ── Paint fill ─────────────────────────────────────────────────────────
     ax.add_patch(Rectangle((-80, -47.5), 160, 190, facecolor='#e8c88a', alpha=0.25, zorder=0))
 
     # ── Hexbin of expected value per shot ──────────────────────────────────
-    df_plot = df[df['SHOT_ATTEMPTED_FLAG'] == 1]
-    hb = ax.hexbin(
-        df_plot['LOC_X'], df_plot['LOC_Y'],
-        C=df_plot['SIM_PTS'],
-        reduce_C_function=np.mean,
-        gridsize=25,
-        cmap='RdYlGn', vmin=0.5, vmax=1.5,
-        mincnt=5,
+    hexagon, centres, mean_pts = hexes
+    hb = PolyCollection(
+        [hexagon],
+        offsets=centres,
+        offset_transform=AffineDeltaTransform(ax.transData),
+        array=mean_pts,
+        cmap='RdYlGn',
         alpha=0.92,
-        extent=[-250, 250, -47.5, 422.5],
         edgecolors='white', linewidths=0.3,
+        rasterized=True,
     )
+    hb.set_clim(0.5, 1.5)
+    ax.add_collection(hb, autolim=False)
     cb = fig.colorbar(hb, ax=ax, fraction=0.03, pad=0.01, aspect=20)
     cb.set_label('Expected pts / attempt', fontsize=9, rotation=270, labelpad=14, color='#1a1209')
     cb.ax.tick_params(labelsize=8, colors='#1a1209')
@@ -88,14 +203,9 @@ def draw_hexbin_chart(line_dist, df):
     def cl(xs, ys, color='#1a1a1a', lw=1.5, **kw):
         ax.plot(xs, ys, color=color, lw=lw, solid_capstyle='round', **kw)
 
-    # ── Static court markings ──────────────────────────────────────────────
-    cl([-250, 250, 250, -250, -250], [-47.5, -47.5, 422.5, 422.5, -47.5], color='#1a1a1a')
-    cl([-80, -80, 80, 80], [-47.5, 142.5, 142.5, -47.5])
-    cl([-80, 80], [142.5, 142.5])
-    ax.add_patch(Arc((0, 142.5), 120, 120, theta1=0, theta2=180, color='#1a1a1a', lw=1.5))
-    ax.add_patch(Arc((0, 0), 80, 80, theta1=0, theta2=180, color='#1a1a1a', lw=1.5))
-    ax.add_patch(Circle((0, 0), 7.5, fill=False, color='#1a1a1a', lw=1.5))
-    cl([-30, 30], [-7.5, -7.5])
+    # ── Static court markings (one cached collection) ──────────────────────
+    ax.add_collection(LineCollection(court_segments(), colors='#1a1a1a', linewidths=1.5,
+                                     capstyle='round', joinstyle='round', zorder=2))
 
     # ── Helper: draw a 3-point line given distance ─────────────────────────
     def draw_3pt(dist, color, lw, ls='-'):
@@ -176,7 +286,7 @@ st.markdown("""
 
 # ── Sidebar ───────────────────────────────────────────────────────────────────
 st.sidebar.header("Settings")
-line_dist = st.sidebar.slider("3-Point Line Distance (ft)", 22.0, 32.0, 23.75, step=0.25)
+line_dist = st.sidebar.slider("3-Point Line Distance (ft)", ARC_MIN, ARC_MAX, 23.75, step=ARC_STEP)
 
 corn_display = round(line_dist - 1.75, 2)
 st.sidebar.markdown(f"""
@@ -192,49 +302,88 @@ if line_dist > 26.75:
     st.sidebar.warning("Corner 3 zone eliminated at this distance.")
 
 # ── Data loading ──────────────────────────────────────────────────────────────
-@st.cache_data
+# Court coordinates fit in ±32k and the made flag is 0/1 — downcast once on load
+SHOT_COLUMNS = {'LOC_X': np.int16, 'LOC_Y': np.int16, 'SHOT_DISTANCE': np.int16, 'SHOT_MADE_FLAG': np.int8}
+
 def load_data():
-    return pd.read_parquet('league_shots.parquet')
+    """Reads the shot columns straight from Arrow into NumPy — no DataFrame in between."""
+    tbl = pq.read_table('league_shots.parquet', columns=list(SHOT_COLUMNS))
+    return {col: tbl.column(col).to_numpy().astype(dtype) for col, dtype in SHOT_COLUMNS.items()}
+
+@st.cache_resource
+def load_geometry():
+    """Loads the shots and preprocesses them once per server — the only dataset handle."""
+    return preprocess(load_data())
+
+@st.cache_resource
+def load_hex_grid():
+    """Hexagon assignment of every shot — fixed, so the map only re-weights per distance."""
+    geo = load_geometry()
+    return hex_grid(geo.locx, geo.locy)
+
+ZoneTable = namedtuple('ZoneTable', ['base_code', 'three_code', 'three_bits'])
+
+@st.cache_resource
+def load_zone_table():
+    """Per-shot zone codes split into the parts the slider can and cannot change.
+
+    base_code (Paint / Short / Long Mid) and three_code (Wing / Corner / Top) are fixed;
+    only "is it a three?" moves with the arc, stored bit-packed: [len(ARC_DISTS), shots / 8].
+    """
+    geo        = load_geometry()
+    base_code  = np.select([geo.dist_ft < 8, geo.dist_ft < 16], [0, 1], default=2).astype(np.int8)
+    three_code = THREE_ZONE_BY_BUCKET[geo.angle_bucket]
+    three_bits = np.packbits([simulate_new_zones(geo, dist)[0] >= 3 for dist in ARC_DISTS], axis=1)
+    return ZoneTable(base_code, three_code, three_bits)
+
+def sim_zones(dist):
+    """Zone code and simulated points per shot — a table row for any slider distance."""
+    geo = load_geometry()
+    k   = (dist - ARC_MIN) / ARC_STEP
+    if k.is_integer() and 0 <= k < len(ARC_DISTS):
+        table    = load_zone_table()
+        is_three = np.unpackbits(table.three_bits[int(k)], count=len(geo.made)).view(bool)
+        codes    = np.where(is_three, table.three_code, table.base_code)
+        return codes, ZONE_POINTS[codes] * geo.made
+    return simulate_new_zones(geo, dist)
 
 @st.cache_data
-def compute_baseline(_df):
-    df = _df.copy()
-    df['SIM_ZONE'] = df.apply(simulate_new_zones, args=(23.75,), axis=1)
-    df['SIM_PTS']  = df['SIM_ZONE'].apply(lambda x: 3 if '3 (Sim)' in x else 2) * df['SHOT_MADE_FLAG']
-    return df.groupby('SIM_ZONE')['SIM_PTS'].mean()
+def compute_baseline():
+    return zone_pps(*sim_zones(23.75))
 
 @st.cache_data
-def compute_zone_data(_df, dist):
-    """Returns processed df, zone_stats dict, shot_pct dict — cached by distance."""
-    df = _df.copy()
-    df['SIM_ZONE'] = df.apply(simulate_new_zones, args=(dist,), axis=1)
-    df['SIM_PTS']  = df['SIM_ZONE'].apply(lambda x: 3 if '3 (Sim)' in x else 2) * df['SHOT_MADE_FLAG']
-    zone_stats = df.groupby('SIM_ZONE')['SIM_PTS'].mean().to_dict()
-    counts     = df.groupby('SIM_ZONE').size()
-    shot_pct   = (counts / counts.sum() * 100).to_dict()
-    return df, zone_stats, shot_pct
+def compute_zone_data(dist):
+    """Returns binned hexes, zone_stats dict, shot_pct dict — cached by distance."""
+    codes, pts = sim_zones(dist)
+
+    zone_stats = zone_pps(codes, pts)
+    counts     = np.bincount(codes, minlength=len(ZONE_ORDER))
+    pct        = counts / counts.sum() * 100
+    shot_pct   = {z: pct[i] for i, z in enumerate(ZONE_ORDER) if pct[i] > 0}
+    hexes      = hex_mean(load_hex_grid(), pts)
+    return hexes, zone_stats, shot_pct
 
 @st.cache_data
-def render_hexbin_png(_df, line_dist):
+def render_hexbin_png(line_dist):
     """Renders hexbin chart and returns PNG bytes — cached by distance."""
-    fig = draw_hexbin_chart(line_dist, _df)
+    fig = draw_hexbin_chart(line_dist, compute_zone_data(line_dist)[0])
     buf = io.BytesIO()
-    fig.savefig(buf, format='png', dpi=150, bbox_inches='tight',
-                facecolor=fig.get_facecolor())
-    plt.close(fig)
+    # Figure is already laid out at its final size and dpi (tight_layout), so
+    # print straight from the canvas — no savefig bbox pass, no pyplot close
+    fig.canvas.print_png(buf)
     buf.seek(0)
     return buf.getvalue()
 
 try:
-    df = load_data()
+    load_geometry()
 except Exception as e:
     st.error(f"Error loading data: {e}. Ensure 'league_shots.parquet' is in this folder.")
     st.stop()
 
-baseline_stats = compute_baseline(df)
+baseline_stats = compute_baseline()
 
 # ── Processing (cached by distance) ──────────────────────────────────────────
-df_processed, zone_stats, shot_pct = compute_zone_data(df, line_dist)
+_, zone_stats, shot_pct = compute_zone_data(line_dist)
 
 # ── Layout ────────────────────────────────────────────────────────────────────
 col1, col2 = st.columns([1, 2.5], gap='large')
@@ -249,6 +398,7 @@ with col1:
         reverse=True,
     )
     missing = [z for z in ZONE_ORDER if zone_stats.get(z) is None]
+    colors  = dict(zip(ranked, pps_to_hsl([zone_stats[z] for z in ranked])))
 
     for rank_idx, zone in enumerate(ranked + missing, start=1):
         display = ZONE_DISPLAY[zone]
@@ -267,7 +417,7 @@ with col1:
   </div>
 </div>""", unsafe_allow_html=True)
         else:
-            color = pps_to_hsl(pps)
+            color = colors[zone]
             fixed_zone = zone in {'Paint', 'Short Mid-Range'}
             delta = (pps - base if base is not None else None) if not fixed_zone else None
             if delta is not None:
@@ -292,5 +442,5 @@ with col1:
 
 with col2:
     st.subheader("Spatial Efficiency Map")
-    png = render_hexbin_png(df_processed, line_dist)
+    png = render_hexbin_png(line_dist)
     st.image(png, use_container_width=True)
@@ -1,8 +1,12 @@
 print("--- 1. SCRIPT STARTING ---")
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import pandas as pd
 import numpy as np
+import orjson
+import pyarrow.parquet as pq
+from numba import njit
+from collections import namedtuple
+from functools import lru_cache
 import os
 
 print("--- 2. LIBRARIES LOADED ---")
@@ -16,7 +20,11 @@ print(f"--- 3. LOOKING FOR DATA IN: {os.getcwd()} ---")
 
 if os.path.exists(file_name):
     print(f"--- 4. FOUND {file_name}. LOADING... ---")
-    df = pd.read_parquet(file_name)
+    # Read the columns straight from Arrow into NumPy (no DataFrame). Court
+    # coordinates fit in ±32k and the made flag is 0/1 — downcast once
+    shot_columns = {'LOC_X': np.int16, 'LOC_Y': np.int16, 'SHOT_DISTANCE': np.int16, 'SHOT_MADE_FLAG': np.int8}
+    tbl = pq.read_table(file_name, columns=list(shot_columns))
+    shots = {col: tbl.column(col).to_numpy().astype(dtype) for col, dtype in shot_columns.items()}
     print("--- 5. DATA LOADED SUCCESSFULLY ---")
 else:
     print(f"--- 4. ERROR: {file_name} NOT FOUND! ---")
@@ -24,34 +32,85 @@ else:
     exit()
 
 # --- THE GEOMETRY ENGINE ---
-def simulate_new_zones(row, new_arc_dist):
+# Zone codes index into this list; every code >= 3 is a three-pointer.
+ZONE_ORDER = [
+    'Paint',
+    'Short Mid-Range',
+    'Long Mid-Range (Sim)',
+    'Wing 3 (Sim)',
+    'Corner 3 (Sim)',
+    'Top of Key 3 (Sim)',
+]
+
+ShotGeometry = namedtuple('ShotGeometry', ['dist_ft', 'is_corner', 'x_abs', 'angle_bucket', 'made'])
+
+def preprocess(shots):
+    # Everything that does not depend on the arc distance, computed once at startup
     # Handle NBA API decifeet units
-    dist = row['SHOT_DISTANCE'] / 10 if row['SHOT_DISTANCE'] > 100 else row['SHOT_DISTANCE']
-    x, y = row['LOC_X'], row['LOC_Y']
-    x_abs = abs(x)
-    
-    # 1. Static Zones
-    if dist < 8: return 'Paint'
-    if dist < 16: return 'Short Mid-Range'
-
-    # 2. Dynamic Corner Logic
-    new_corner_dist = new_arc_dist - 1.75
-    is_corner_area = y < 92.5 # Traditional 'break' height
-    
-    if is_corner_area:
-        # Corner 3s move out as the slider moves
-        if x_abs >= (new_corner_dist * 10) and x_abs <= 250:
-            return 'Corner 3 (Sim)'
-    else:
-        # Above the break shots
-        if dist >= new_arc_dist:
-            angle = np.arctan2(y, x) * 180 / np.pi
-            if (22 < angle < 70) or (110 < angle < 158):
-                return 'Wing 3 (Sim)'
-            else:
-                return 'Top of Key 3 (Sim)'
-    
-    return 'Long Mid-Range (Sim)'
+    shot_dist = shots['SHOT_DISTANCE']
+    dist_ft = np.where(shot_dist > 100, shot_dist / 10, shot_dist).astype(np.float32)
+    x, y = shots['LOC_X'], shots['LOC_Y']
+
+    is_corner = y < 92.5 # Traditional 'break' height
+
+    # Above the break: 1 = wing, 2 = top of key (0 = angle never needed).
+    # Only shots past the short mid-range can be threes, so arctan2 runs on
+    # that subset rather than on every shot
+    needs_angle = ~is_corner & (dist_ft >= 16)
+    angle = np.arctan2(y[needs_angle], x[needs_angle]) * 180 / np.pi
+    is_wing = ((22 < angle) & (angle < 70)) | ((110 < angle) & (angle < 158))
+    angle_bucket = np.zeros(len(dist_ft), dtype=np.int8)
+    angle_bucket[needs_angle] = np.where(is_wing, 1, 2)
+
+    geo = ShotGeometry(dist_ft, is_corner, np.abs(x), angle_bucket, shots['SHOT_MADE_FLAG'])
+    for arr in geo:
+        arr.flags.writeable = False # shared by every request thread
+    return geo
+
+@njit(fastmath=True, cache=True)
+def _zones(dist_ft, is_corner, x_abs, angle_bucket, made, line_dist, codes_out, pts_out):
+    corner_x = (line_dist - 1.75) * 10
+    for i in range(dist_ft.shape[0]):
+        d = dist_ft[i]
+        # 1. Static Zones
+        if d < 8:
+            k = 0
+        elif d < 16:
+            k = 1
+        # 2. Dynamic Corner Logic: corner 3s move out as the slider moves
+        elif is_corner[i]:
+            k = 4 if corner_x <= x_abs[i] <= 250 else 2
+        # 3. Above the break shots
+        elif d >= line_dist:
+            k = 3 if angle_bucket[i] == 1 else 5
+        else:
+            k = 2
+        codes_out[i] = k
+        pts_out[i] = (3 if k >= 3 else 2) * made[i]
+
+def simulate_new_zones(geo, new_arc_dist):
+    # Returns (ZONE_ORDER index, simulated points) per shot
+    codes = np.empty(len(geo.dist_ft), dtype=np.int8)
+    pts = np.empty(len(geo.dist_ft), dtype=np.float32)
+    _zones(*geo, float(new_arc_dist), codes, pts)
+    return codes, pts
+
+geo = preprocess(shots)
+
+@lru_cache(maxsize=128)
+def compute_zone_stats(line_dist):
+    # Process the simulation on the shared read-only arrays (no per-request copy).
+    # PPS: (3pts if zone is a 3, else 2pts) * Shot Made (1 or 0)
+    codes, pts = simulate_new_zones(geo, line_dist)
+
+    # Group results for the frontend: zone codes are small ints, so a
+    # bincount replaces the groupby
+    sums = np.bincount(codes, weights=pts, minlength=len(ZONE_ORDER))
+    counts = np.bincount(codes, minlength=len(ZONE_ORDER))
+    return {
+        zone: {'pps': float(sums[i] / counts[i]), 'volume': int(counts[i])}
+        for i, zone in enumerate(ZONE_ORDER) if counts[i] > 0
+    }
 
 # --- THE API ENDPOINT ---
 # --- [REPLACE EVERYTHING FROM @app.route DOWNWARDS WITH THIS] ---
@@ -63,24 +122,13 @@ def calculate():
         data = request.json
         line_dist = data.get('threePtDistance', 23.75)
         
-        # Process the simulation
-        df_sim = df.copy()
-        df_sim['SIM_ZONE'] = df_sim.apply(simulate_new_zones, args=(line_dist,), axis=1)
-        
-        # Calculate PPS: (3pts if zone is a 3, else 2pts) * Shot Made (1 or 0)
-        df_sim['SIM_PTS'] = df_sim['SIM_ZONE'].apply(
-            lambda x: 3 if '3 (Sim)' in x else 2
-        ) * df_sim['SHOT_MADE_FLAG']
-
-        # Group results for the frontend
-        # FIXED TYPO HERE: Changed 'dfsim' to 'df_sim'
-        stats = df_sim.groupby('SIM_ZONE').agg({
-            'SIM_PTS': 'mean',
-            'SHOT_MADE_FLAG': 'count'
-        }).rename(columns={'SIM_PTS': 'pps', 'SHOT_MADE_FLAG': 'volume'}).to_dict(orient='index')
+        # Snap to the slider's 0.25 ft grid so repeat values hit the cache
+        ld_q = round(float(line_dist) * 4) / 4
+        stats = compute_zone_stats(ld_q)
         
         print("--- CALCULATION COMPLETE. SENDING RESULTS ---")
-        return jsonify(stats)
+        # At most six {pps, volume} entries — orjson dumps them faster than jsonify
+        return app.response_class(orjson.dumps(stats), mimetype='application/json')
         
     except Exception as e:
         print(f"ERROR IN CALCULATION: {e}")